@@ -1,52 +1,187 @@
 import streamlit as st
 from google import genai
-import wikipediaapi
-import wikipedia
+import aiohttp
+import asyncio
 import time
+import threading
+import queue
 import json
 import os
+import hashlib
+import tempfile
+import sqlite3
 import re
+import string
 import requests
 from difflib import get_close_matches
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+# Patterns used on every report/validation, compiled once at import.
+_WORD_RE = re.compile(r"\w+")
+_BLS_LINK_RE = re.compile(r'<li><a href="iag[^"]+">([^<]+)</a>')
+_DISAMBIGUATION_RE = re.compile(r"\(disambiguation\)$", re.IGNORECASE)
+# A chatty opening line ("Certainly! Here is the section:") before the section heading
+_FILLER_RE = re.compile(
+    r"^\s*(?:Here is|Here's|Certainly|Sure|Of course|As requested|Below is)\b[^\n:]*:?\s*\n+", re.IGNORECASE
+)
+# Characters an industry name may contain
+_INDUSTRY_CHARS = frozenset(string.ascii_letters + string.digits + string.whitespace + "&,.-/")
+_SENTENCE_ENDS = (".", "!", "?")
+# Deletes NULs and carriage returns from model output
+_CLEAN_TBL = str.maketrans("", "", "\u0000\r")
+
+# Head nouns that only name an industry. An input ending in one of these is accepted locally when
+# the words before it are a known industry too (e.g. "Healthcare Services", "Mining Industry").
+_SECTOR_WORDS = frozenset({
+    "industry", "industries", "sector", "market", "markets", "manufacturing", "services",
+    "retail", "wholesale", "software", "energy", "power", "insurance", "banking", "logistics",
+    "technology", "tech", "mining", "farming", "agriculture", "construction", "hospitality",
+    "tourism", "healthcare", "pharmaceuticals", "telecommunications", "transportation",
+    "publishing", "media", "entertainment", "education", "finance",
+})
+
+# Common industry names users type as-is; these are accepted without a BLS lookup or Gemini call.
+_INDUSTRY_ALLOWLIST = frozenset({
+    "saas", "paas", "iaas", "fintech", "insurtech", "proptech", "edtech", "healthtech", "medtech",
+    "biotech", "biotechnology", "agritech", "adtech", "martech", "legaltech", "regtech", "cleantech",
+    "real estate", "ecommerce", "e-commerce", "retail", "wholesale", "healthcare", "pharma",
+    "pharmaceuticals", "medical devices", "hospitals", "telehealth", "cybersecurity",
+    "cloud computing", "artificial intelligence", "machine learning", "semiconductors",
+    "consumer electronics", "video games", "gaming", "esports", "streaming", "social media",
+    "advertising", "digital marketing", "public relations", "consulting", "accounting",
+    "legal services", "banking", "investment banking", "asset management", "private equity",
+    "venture capital", "insurance", "reinsurance", "payments", "cryptocurrency", "blockchain",
+    "nfts", "renewable energy", "solar energy", "wind energy", "oil and gas", "oil & gas",
+    "utilities", "nuclear power", "electric vehicles", "automotive", "aerospace", "defense",
+    "aviation", "airlines", "shipping", "logistics", "trucking", "railways", "telecommunications",
+    "construction", "architecture", "mining", "steel", "chemicals", "plastics", "textiles",
+    "fashion", "apparel", "luxury goods", "cosmetics", "beauty", "personal care", "fitness",
+    "sports", "hospitality", "hotels", "restaurants", "food service", "food and beverage",
+    "food & beverage", "agriculture", "farming", "fisheries", "forestry", "tourism", "travel",
+    "education", "higher education", "publishing", "journalism", "film", "music", "entertainment",
+    "pet care", "pet grooming", "childcare", "elder care", "waste management", "recycling",
+    "water treatment", "manufacturing", "robotics", "3d printing", "biopharma", "dental care",
+})
+# Openers that mark a sentence rather than an industry name (e.g. "I am hungry", "my business")
+_SENTENCE_OPENERS = frozenset({"i", "i'm", "my", "we", "you", "please"})
+
+LLM_CACHE_PATH = ".llm_cache.sqlite3"
+LLM_CACHE_TTL = 86400
+
+# Gemini replies are cached on disk by a SHA-256 of the model and everything sent to it, so the
+# same prompt (from any session, or after a restart) is answered without another API call.
+# A fresh connection per call keeps this safe to use from the section worker threads.
+def llm_cache_key(model, *prompt_parts):
+    digest = hashlib.sha256(model.encode())
+    for part in prompt_parts:
+        digest.update(b"\0" + part.encode())
+    return digest.hexdigest()
+
+def llm_cache_get(key):
+    try:
+        with closing(sqlite3.connect(LLM_CACHE_PATH)) as conn:
+            row = conn.execute(
+                "SELECT text FROM responses WHERE key = ? AND expiry > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+    except sqlite3.Error:
+        return None
+
+def llm_cache_put(key, text):
+    try:
+        with closing(sqlite3.connect(LLM_CACHE_PATH)) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, text TEXT NOT NULL, expiry REAL NOT NULL)"
+            )
+            conn.execute("DELETE FROM responses WHERE expiry <= ?", (time.time(),))
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, text, time.time() + LLM_CACHE_TTL)
+            )
+    except sqlite3.Error:
+        pass
+
+def normalize_industry(text):
+    return " ".join(text.lower().split())
+
+BLS_CACHE_PATH = ".bls_cache.json"
+BLS_CACHE_TTL = 7 * 86400
+
+# Written to a temp file and renamed into place, so a concurrent reader (or a crash mid-write)
+# never sees a half-written cache file.
+def _write_json_atomic(path, data):
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Don't leave the temp file behind
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
 
 @st.cache_data(show_spinner=False) # ton ensure that system correctly identifies industries, i uncluded link to the websites with list of industries as example.
 # I implemented it using Decorator feature. 
+# The BLS list hardly ever changes, so besides st.cache_data (per process) it's kept in a JSON
+# file for a week and a restarted server doesn't have to download and parse the page again.
 def load_bls_industries():
+    try:
+        if time.time() - os.path.getmtime(BLS_CACHE_PATH) < BLS_CACHE_TTL:
+            with open(BLS_CACHE_PATH, encoding="utf-8") as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
+
     try:
         response = requests.get(
             "https://www.bls.gov/iag/tgs/iag_index_alpha.htm", timeout=10
         )
-        matches = re.findall(r'<li><a href="iag[^"]+">([^<]+)</a>', response.text)
-        return [m.strip().lower() for m in matches if m.strip()]
+        matches = _BLS_LINK_RE.findall(response.text)
+        industries = [m.strip().lower() for m in matches if m.strip()]
     except Exception:
         return []
-# To ensure that user input is indeed relevant industry I included several guardrails to ensure no digits, no whitespaces, included, 
-# i reinforced it with AI prompt with detailed instructions. 
-def is_valid_industry(client, user_input):
-    text = user_input.strip() 
-
-    if len(text) < 3 or text.isdigit():
-        return False
-    if not re.match(r'^[a-zA-Z0-9\s\&\,\.\-\/]+$', text):
-        return False
-
-    bls_industries = load_bls_industries()
-    if bls_industries:
-        close = get_close_matches(text.lower(), bls_industries, n=1, cutoff=0.6)
-        if close:
-            return True 
-
-    try:
-        validation_prompt = f"""
+    if industries:
+        _write_json_atomic(BLS_CACHE_PATH, industries)
+    return industries
+# BLS names as a frozenset, built once per process
+@st.cache_resource(show_spinner=False)
+def bls_industry_set():
+    return frozenset(load_bls_industries())
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+# Maps each 3-character substring to the BLS names containing it, built once per process
+@st.cache_resource(show_spinner=False)
+def bls_trigram_index():
+    index = {}
+    for name in load_bls_industries():
+        for trigram in _trigrams(name):
+            index.setdefault(trigram, set()).add(name)
+    return index
+
+# Only a verdict Gemini actually returned is cached: a failed call raises here, so st.cache_data
+# stores nothing and the next request asks again. The leading underscore keeps the client out of
+# the cache key.
+@st.cache_data(ttl=86400, show_spinner=False)
+def _gemini_industry_verdict(_client, text):
+    validation_prompt = f"""
         You are a strict classifier for a Market Research tool used by professional business analysts.
         Decide if the input below is a real, recognised business industry or economic sector.
 
         Input: "{text}"
 
-        Answer YES if it is a recognised industry, sector, market, or business niche.
-        Examples of YES: "SaaS", "Renewable Energy", "Cybersecurity", "Fintech", "Pet Grooming", "NFTs"
+        Set is_industry to true if it is a recognised industry, sector, market, or business niche.
+        Examples of true: "SaaS", "Renewable Energy", "Cybersecurity", "Fintech", "Pet Grooming", "NFTs"
 
-        Answer NO for everything that is not an industry:
+        Set is_industry to false for everything that is not an industry:
         - Fictional characters or franchises (e.g. "Batman", "Spiderman", "Star Wars")
         - People's names (e.g. "Elon Musk", "Taylor Swift")
         - Sentences or phrases (e.g. "I am hungry", "the weather is nice")
@@ -54,67 +189,405 @@ def is_valid_industry(client, user_input):
         - Standalone places (e.g. "London", "France")
         - Vague or abstract concepts (e.g. "happiness", "nature", "love")
         - Food items or consumer products (e.g. "Pizza", "Coca-Cola")
-
-        Answer ONLY with YES or NO only.
         """
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=validation_prompt,
-            config={"temperature": 0.0} # as end user for this assitant is professional market researcher, i reducded level of creativity ot 0.0 which means that system will return only factual information. 
-        )
-        verdict = extract_text_from_response(response).strip().upper()
-        return verdict == "YES" 
+    cache_key = llm_cache_key("gemini-2.5-flash-lite", validation_prompt)
+    cached_reply = llm_cache_get(cache_key)
+    if cached_reply is not None:
+        return json.loads(cached_reply)["is_industry"] is True
+
+    # A single boolean needs neither the bigger model nor more than a handful of output tokens;
+    # the JSON schema makes the reply {"is_industry": true/false} with no filler to parse around.
+    response = _client.models.generate_content(
+        model="gemini-2.5-flash-lite",
+        contents=validation_prompt,
+        config={
+            "temperature": 0.0, # as end user for this assitant is professional market researcher, i reducded level of creativity ot 0.0 which means that system will return only factual information. 
+            "top_p": 1.0,
+            "top_k": 1,
+            "max_output_tokens": 16,
+            "response_mime_type": "application/json",
+            "response_schema": {
+                "type": "object",
+                "properties": {"is_industry": {"type": "boolean"}},
+                "required": ["is_industry"],
+            },
+        }
+    )
+    reply = extract_text_from_response(response)
+    verdict = json.loads(reply)["is_industry"] is True
+    llm_cache_put(cache_key, reply)
+    return verdict
+
+# To ensure that user input is indeed relevant industry I included several guardrails to ensure no digits, no whitespaces, included, 
+# i reinforced it with AI prompt with detailed instructions. 
+def is_valid_industry(client, user_input):
+    text = user_input.strip() 
+
+    if len(text) < 3 or text.isdigit() or not _INDUSTRY_CHARS.issuperset(text):
+        return False
+    # Mostly digits and punctuation ("123 456", "1,000.00") is never an industry; "Web 3.0" still passes
+    letters = sum(c.isalpha() for c in text)
+    if letters * 2 < len(text) - text.count(" "):
+        return False
 
+    words = text.lower().split()
+    norm = " ".join(words)
+    if len(words) > 6 or words[0] in _SENTENCE_OPENERS:
+        return False
+    if norm in _INDUSTRY_ALLOWLIST:
+        return True
+
+    # Exact BLS name
+    bls_names = bls_industry_set()
+    if norm in bls_names:
+        return True
+    # "batman industry" ends in a sector noun too, so the rest of the input has to check out as well
+    if len(words) > 1 and words[-1] in _SECTOR_WORDS:
+        head = " ".join(words[:-1])
+        if head in _INDUSTRY_ALLOWLIST or head in bls_names:
+            return True
+    # Only names sharing a trigram with the input go through SequenceMatcher. A heavily misspelt
+    # input that shares none just falls through to the Gemini check below.
+    index = bls_trigram_index()
+    candidates = set().union(*(index.get(trigram, ()) for trigram in _trigrams(norm)))
+    if candidates:
+        close = get_close_matches(norm, candidates, n=1, cutoff=0.6)
+        if close:
+            return True 
+
+    # If Gemini can't be reached the input is let through rather than blocking the report
+    try:
+        return _gemini_industry_verdict(client, text)
     except Exception:
         return True 
 
 
 def extract_text_from_response(response):
-    text_output = ""
-    if response and response.candidates:
-        for part in response.candidates[0].content.parts:
-            if hasattr(part, "text") and part.text:
-                text_output += part.text
-    return text_output.replace("\u0000", "").replace("\r", "").strip()
+    text_parts = []
+    # Blocked responses and trailing stream chunks can carry a candidate without content or parts
+    if response and response.candidates and response.candidates[0].content:
+        for part in response.candidates[0].content.parts or []:
+            text = getattr(part, "text", None)
+            if text:
+                text_parts.append(text)
+    return "".join(text_parts).translate(_CLEAN_TBL).strip()
+
+# Yields text as it arrives from generate_content_stream so the report can be rendered while
+# Gemini is still writing it, instead of showing a spinner for the whole generation.
+def stream_text_from_response(stream, buffer):
+    for chunk in stream:
+        text = chunk.text
+        if text:
+            text = text.translate(_CLEAN_TBL)
+            buffer.append(text)
+            yield text
+
+WIKI_API_URL = "https://en.wikipedia.org/w/api.php"
+WIKI_HEADERS = {"User-Agent": "MarketResearchAssistant 101"}
+WIKI_CACHE_DIR = ".wiki_cache"
+WIKI_CACHE_TTL = 86400
+# Only the lead of each article goes into the prompt (see build_context), so that's all we keep.
+CHARS_PER_SOURCE = 2500
+
+# Each page is one request to the MediaWiki extracts API (plain text + url together), so all
+# search results can be fetched at the same time instead of one after another.
+# A failed request raises (HTTP status, timeout, or an API "error" object, which MediaWiki sends
+# with a 200) instead of looking like an empty result, so a failed lookup never gets cached.
+async def _query_api(session, params):
+    async with session.get(WIKI_API_URL, params=params) as response:
+        response.raise_for_status()
+        data = await response.json()
+    if "error" in data:
+        raise RuntimeError(f"Wikipedia API error: {data['error'].get('info', data['error'])}")
+    return data
+
+async def _fetch_page(session, title):
+    params = {
+        "action": "query",
+        "prop": "extracts|info",
+        "inprop": "url",
+        "explaintext": 1,
+        "redirects": 1,
+        "titles": title,
+        "format": "json",
+    }
+    data = await _query_api(session, params)
+    for page in data.get("query", {}).get("pages", {}).values():
+        if "missing" in page or not page.get("extract"):
+            continue
+        # Disambiguation pages are just lists of links and only dilute the prompt context.
+        if _DISAMBIGUATION_RE.search(page["title"]) or "may refer to:" in page["extract"][:500]:
+            continue
+        # Cut to what the prompt uses right away, so full articles never leave this function
+        return page["fullurl"], page["extract"][:CHARS_PER_SOURCE]
+    return None
+
+async def _search_titles(session, query, limit):
+    params = {
+        "action": "query",
+        "list": "search",
+        "srsearch": query,
+        "srlimit": limit,
+        "srprop": "",
+        "format": "json",
+    }
+    data = await _query_api(session, params)
+    return [result["title"] for result in data.get("query", {}).get("search", [])]
+
+# Search and page fetches share one session (so the connection is reused) and the same 10s
+# per-request timeout, so a slow Wikipedia can't hang the report indefinitely. If any fetch fails
+# the whole lookup raises: a partial source list would otherwise be cached as the answer.
+async def _fetch_pages(query, limit):
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(headers=WIKI_HEADERS, timeout=timeout) as session:
+        titles = await _search_titles(session, query, limit)
+        return await asyncio.gather(*[_fetch_page(session, title) for title in titles])
+
+def _load_wiki_cache(path):
+    try:
+        if time.time() - os.path.getmtime(path) < WIKI_CACHE_TTL:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            return data["urls"], data["texts"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+# Expired files are only skipped on read, so each write also deletes the ones past WIKI_CACHE_TTL
+def _sweep_wiki_cache():
+    try:
+        entries = list(os.scandir(WIKI_CACHE_DIR))
+    except OSError:
+        return
+    cutoff = time.time() - WIKI_CACHE_TTL
+    for entry in entries:
+        try:
+            if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+        except OSError:
+            pass
+
+# Two cache levels: st.cache_data in memory, backed by a JSON file per query in WIKI_CACHE_DIR so
+# results survive a server restart. Only complete lookups reach either level; a failed one raises.
+@st.cache_data(ttl=WIKI_CACHE_TTL, max_entries=64, show_spinner=False)
+def _search_wikipedia(query):
+    cache_path = os.path.join(WIKI_CACHE_DIR, hashlib.sha1(query.encode()).hexdigest() + ".json")
+    cached = _load_wiki_cache(cache_path)
+    if cached:
+        return cached
+
+    # The top 3 search hits are the canonical pages; results 4-5 are usually tangential.
+    pages = asyncio.run(_fetch_pages(query, limit=3))
+    # Two search hits can resolve to the same article (redirects) or open with the same text; the
+    # second copy would only show a duplicate source and repeat the context.
+    urls, all_texts, seen = [], [], set()
+    for page in pages:
+        if page is None:
+            continue
+        url, text = page
+        lead = hash(text[:512])
+        if url in seen or lead in seen:
+            continue
+        seen.update((url, lead))
+        urls.append(url)
+        all_texts.append(text)
+    if urls:
+        _sweep_wiki_cache()
+        _write_json_atomic(cache_path, {"urls": urls, "texts": all_texts})
+    return urls, all_texts
 
 def get_wikipedia_urls(industry_query):
-    search_results = wikipedia.search(industry_query, results=5)
-    wiki_api = wikipediaapi.Wikipedia(
-        user_agent="MarketResearchAssistant 101",
-        language="en"
-    )
-    urls, all_texts = [], []
-    for title in search_results:
-        page = wiki_api.page(title)
-        if page.exists():
-            urls.append(page.fullurl)
-            all_texts.append(page.text)
-    return urls, all_texts
+    # "Healthcare" and " healthcare " are the same search, so they share a cache entry
+    return _search_wikipedia(normalize_industry(industry_query))
+
+# Worker threads for blocking lookups, shared across reruns so a lookup nobody is waiting on any
+# more can still finish (and fill its cache) after the script has moved on.
+@st.cache_resource(show_spinner=False)
+def get_io_pool():
+    return ThreadPoolExecutor(max_workers=8)
+
+# Validation and the Wikipedia lookup don't depend on each other, so both start at once. A rejected
+# industry returns as soon as the verdict is in; the lookup is left to finish in the background.
+async def validate_and_fetch(client, industry):
+    loop = asyncio.get_running_loop()
+    pool = get_io_pool()
+    validation = loop.run_in_executor(pool, is_valid_industry, client, normalize_industry(industry))
+    lookup = loop.run_in_executor(pool, get_wikipedia_urls, industry)
+    if not await validation:
+        return False, ([], [])
+    return True, await lookup
+
+# The lead of a Wikipedia article carries most of what defines an industry, so only the first
+# chars_per_source characters of each page are used. Search results often overlap (a parent
+# article and a sub-topic repeat the same paragraphs), so paragraphs already seen in an earlier
+# source are dropped. Extracts separate paragraphs with a single newline.
+def build_context(all_texts, chars_per_source=CHARS_PER_SOURCE):
+    seen = set()
+    sources = []
+    for text in all_texts:
+        novel = []
+        for paragraph in text[:chars_per_source].split("\n"):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            fingerprint = hash(paragraph[:200])
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                novel.append(paragraph)
+        if novel:
+            sources.append("\n".join(novel))
+    return "\n\n NEXT SOURCE \n\n".join(sources)
+
+# Section instructions are fixed apart from the section name and industry, so the template is
+# built once at import and each call only fills in those two fields.
+SECTION_PROMPT_TEMPLATE = """
+    You are a senior Market Research Analyst writing for a corporate leadership team.
+    Write ONLY the "{section}" section of an industry report on: "{industry}".
+
+    STRICT RULES:
+    - Write between 90 and 100 words. 
+    - Start directly with the section heading: {section}
+    - Write in a professional, data-driven tone.
+    - Base your writing strictly on the Wikipedia context provided.
+    - Output ONLY the section text. No commentary, no word count.
+    """
+
+# context_block is the "WIKIPEDIA CONTEXT:" block built once per report, or "" when the context
+# lives in a Gemini cache. It goes first, matching the explicit cache layout: the five prompts then
+# share one long identical prefix that Gemini's implicit prompt caching can reuse.
+def build_section_prompt(section, industry, context_block=""):
+    return context_block + SECTION_PROMPT_TEMPLATE.format(section=section, industry=industry)
+
+# gemini-2.5-flash won't cache fewer than 1024 tokens; English prose runs about 4 chars per token.
+CONTEXT_CACHE_MIN_CHARS = 4 * 1024
+
+# All five sections share the same Wikipedia context, so it is uploaded once as a Gemini context
+# cache and each section call only sends its own instructions. Returns None if the cache can't be
+# created; the context is then sent inline with every section instead. A context that is clearly
+# under the model's minimum cacheable size is sent inline without asking, saving a failed round trip.
+def create_context_cache(client, context_block):
+    if len(context_block) < CONTEXT_CACHE_MIN_CHARS:
+        return None
+    try:
+        return client.caches.create(
+            model="gemini-2.5-flash",
+            config={"contents": [context_block], "ttl": "300s"},
+        )
+    except Exception:
+        return None
+
+# Runs in a worker thread: streams one section and passes each piece of text to the script thread
+# through `updates`, which does the rendering. Returns the full section text.
+# An empty or failed stream is retried once after a short backoff; `(section, None)` tells the
+# script thread to clear whatever the failed attempt had already shown.
+def generate_section(client, section, industry, context_block, cache_name, updates, attempts=2):
+    # ~100 words plus the heading is ~150 tokens; 220 leaves room for a modest overshoot without
+    # paying for runaway output or cutting a normal section off mid-sentence.
+    # Thinking is off because its tokens count towards max_output_tokens.
+    section_config = {
+        "temperature": 0.7,
+        "top_p": 0.95,
+        "max_output_tokens": 220,
+        "thinking_config": {"thinking_budget": 0},
+    }
+    if cache_name:
+        section_config["cached_content"] = cache_name
+
+    section_prompt = build_section_prompt(section, industry, "" if cache_name else context_block)
+
+    for attempt in range(attempts):
+        last_attempt = attempt == attempts - 1
+        if attempt:
+            time.sleep(0.5 * 2 ** (attempt - 1))
+            updates.put((section, None))
+
+        try:
+            section_stream = client.models.generate_content_stream(
+                model="gemini-2.5-flash",
+                contents=section_prompt,
+                config=section_config
+            )
+            section_buffer = []
+            for text in stream_text_from_response(section_stream, section_buffer):
+                updates.put((section, text))
+        except Exception:
+            if last_attempt:
+                raise
+            continue
+
+        # Each section is stripped on its own: filler can open any of the five, not just the first
+        section_text = _FILLER_RE.sub("", "".join(section_buffer), count=1).strip()
+        if section_text or last_attempt:
+            return section_text
+
+# The cache key covers the context even when it travels in a Gemini context cache rather than in
+# the prompt, so a report on different sources never reuses an old section.
+def section_cache_key(section, industry, context_block):
+    return llm_cache_key("gemini-2.5-flash", context_block, build_section_prompt(section, industry))
 
 def word_count(text):
-    return len(re.findall(r"\b\w+\b", text))
+    return len(_WORD_RE.findall(text))
 
 def enforce_word_limits(text, min_words=450, max_words=490): # I included both minimum and maximum requirements for word count to ensure that report is elaborate enough. 
-    matches = list(re.finditer(r"\b\w+\b", text))
-    count = len(matches)
-
-    if count > max_words:
-        cutoff_pos = matches[max_words - 1].end()
+    # Walks at most max_words + 1 matches and returns the word count along with the text
+    words = _WORD_RE.finditer(text)
+    count, last_kept = 0, None
+    for last_kept in islice(words, max_words):
+        count += 1
+
+    if next(words, None) is not None:
+        cutoff_pos = last_kept.end()
         truncated = text[:cutoff_pos].rstrip()
-        if not truncated.endswith((".", "!", "?")):
-            last_end = max(
-                truncated.rfind("."),
-                truncated.rfind("!"),
-                truncated.rfind("?")
-            )
+        if not truncated.endswith(_SENTENCE_ENDS):
+            # Cut back to the last sentence end in the kept text
+            last_end = max(map(truncated.rfind, _SENTENCE_ENDS))
             if last_end != -1:
+                count -= word_count(truncated[last_end + 1:])
                 truncated = truncated[:last_end + 1]
-        return truncated, "truncated"
+        return truncated, "truncated", count
 
     if count < min_words:
-        return text, "too_short"
+        return text, "too_short", count
+
+    return text, "ok", count
 
-    return text, "ok"
+def _warm_up_client(client):
+    try:
+        client.models.list()
+    except Exception:
+        pass
+
+# One client per API key, shared across reruns so its HTTP connection pool is reused. A new client
+# makes one cheap models.list() call in the background, so DNS, TLS and auth are sorted out
+# before the first real request.
+@st.cache_resource(show_spinner=False)
+def get_client(api_key):
+    client = genai.Client(api_key=api_key)
+    threading.Thread(target=_warm_up_client, args=(client,), daemon=True).start()
+    return client
+
+def show_sources(urls):
+    st.subheader("Relevant Wikipedia Sources")
+    for i, url in enumerate(urls, 1):
+        st.write(f"{i}. {url}")
+    st.divider()
+
+def show_word_count_status(final_count, status):
+    st.divider()
+    st.info(f"📊 Final Word Count: {final_count} words")
+
+    if status == "too_short":
+        st.warning(f"⚠️ Report is under 450 words ({final_count} words). Try regenerating.")
+    elif status == "truncated":
+        st.info(f"✂️ Report was trimmed to {final_count} words.")
+    else:
+        st.success("✅ Report meets the 450–500 word target.")
+
+def show_saved_report(report):
+    show_sources(report["urls"])
+    st.subheader(f"{report['industry']} Industry Report")
+    st.write(report["text"])
+    show_word_count_status(report["count"], report["status"])
 
 # Sidebar
 with st.sidebar:
@@ -161,131 +634,180 @@ with st.sidebar:
     if not st.session_state.get("api_key_saved"):
         st.warning("Please save your API key to begin.")
 
-    if "my_api_key_persistent" not in st.session_state:
-        saved_key, saved_expiry = load_key_local()
-        if saved_key and saved_expiry:
-            st.session_state.my_api_key_persistent = saved_key
-            st.session_state.api_key_expiry = saved_expiry
-            st.session_state.api_key_saved = True
-
-    current_time = time.time()
-    if "api_key_expiry" in st.session_state:
-        if current_time > st.session_state.api_key_expiry:
-            st.session_state.my_api_key_persistent = ""
-            st.session_state.api_key_expiry = 0
-            st.session_state.api_key_saved = False
-            st.warning("API Key expired (30 min limit reached).")
-
-    default_key = st.session_state.get("my_api_key_persistent", "")
-
 # Gemini client 
 client = None
 if st.session_state.get("api_key_saved"):
-    client = genai.Client(api_key=st.session_state.my_api_key_persistent)
+    client = get_client(st.session_state.my_api_key_persistent)
 
 # Main section 
 st.title("Market Research Assistant 101")
-industry = st.text_input("Which industry are you researching today?", key="industry_input")
 
-if st.button("Generate Report"):
-    if not industry.strip():
-        st.error("Please provide an industry name to proceed.")
-    elif not client:
-        st.error("Please provide your API key in the sidebar.")
-    else:
-        # Step 1: Validating industry
-        with st.spinner("Validating industry..."):
-            if not is_valid_industry(client, industry):
+# Everything below lives in a fragment: typing an industry or clicking Generate/Regenerate reruns
+# only this part, not the sidebar and the rest of the script. The client comes from the last full
+# run, so an expired key forces a full rerun and the sidebar clears it.
+@st.fragment
+def report_section(client):
+    if client and time.time() > st.session_state.get("api_key_expiry", 0):
+        st.rerun()
+
+    industry = st.text_input("Which industry are you researching today?", key="industry_input")
+
+    generate_clicked = st.button("Generate Report")
+    regenerate_clicked = st.button("Regenerate", help="Ignore the saved report and generate a new one.")
+    # The last report is kept in session state so asking for the same industry again re-displays it
+    # instead of repeating the Wikipedia and Gemini calls. "Regenerate" bypasses it.
+    last_report = st.session_state.get("last_report", {})
+
+    if generate_clicked or regenerate_clicked:
+        if not industry.strip():
+            st.error("Please provide an industry name to proceed.")
+        elif generate_clicked and last_report.get("industry") == industry:
+            show_saved_report(last_report)
+        elif not client:
+            st.error("Please provide your API key in the sidebar.")
+        else:
+            # Step 1 & 2: Validating industry while finding Wikipedia pages
+            with st.spinner("Validating industry and finding relevant Wikipedia sources..."):
+                try:
+                    is_valid, (relevant_urls, all_texts) = asyncio.run(validate_and_fetch(client, industry))
+                except Exception as e:
+                    st.error(f"Couldn't reach Wikipedia, please try again in a moment. ({e})")
+                    return
+
+            if not is_valid:
                 st.error(
                     f'⚠️ "{industry}" does not appear to be a recognised industry. '
                     "Please enter a valid business sector or market (e.g. Renewable Energy, "
                     "Cybersecurity, Retail, Manufacturing)."
                 )
-                st.stop()
-
-        # Step 2: Wikipedia pages
-        with st.spinner("Finding relevant Wikipedia sources..."):
-            relevant_urls, all_texts = get_wikipedia_urls(industry)
-
-        if not relevant_urls:
-            st.warning("No relevant Wikipedia pages found. Try a broader industry name.")
-            st.stop()
-
-        st.subheader("Relevant Wikipedia Sources")
-        for i, url in enumerate(relevant_urls, 1):
-            st.write(f"{i}. {url}")
-        st.divider()
-
-        # Step 3: Generate report
-        with st.spinner("Drafting your industry report..."):
-
-            full_context = "\n\n NEXT SOURCE \n\n".join(
-                text[:6000] for text in all_texts
-            )
-
-    #During the course of preparing this chat, I found that making system meet the word count by seperating instructions for text into sub sections work best. 
-
-            sections = [
-                "EXECUTIVE SUMMARY",
-                "MARKET DYNAMICS & SIZE",
-                "KEY TECHNOLOGICAL OR SOCIAL TRENDS",
-                "COMPETITIVE LANDSCAPE",
-                "FUTURE OUTLOOK & CHALLENGES"
-            ]
-
-            try:
-                report_parts = []
-
-                for section in sections:
-                    section_prompt = f"""
-                    You are a senior Market Research Analyst writing for a corporate leadership team.
-                    Write ONLY the "{section}" section of an industry report on: "{industry}".
-
-                    STRICT RULES:
-                    - Write between 90 and 100 words. 
-                    - Start directly with the section heading: {section}
-                    - Write in a professional, data-driven tone.
-                    - Base your writing strictly on the Wikipedia context provided below.
-                    - Output ONLY the section text. No commentary, no word count.
-
-                    WIKIPEDIA CONTEXT:
-                    {full_context}
-                    """
-
-                    section_response = client.models.generate_content(
-                        model="gemini-2.5-flash",
-                        contents=section_prompt,
-                        config={"temperature": 0.7, "top_p": 0.95, "max_output_tokens": 8000}
-                    )
-                    section_text = extract_text_from_response(section_response)
-
-                    if not section_text.strip():
-                        st.error(f"⚠️ Model returned empty response for section: {section}")
-                        st.stop()
-                    report_parts.append(section_text.strip())
-                # Combine all 5 sections
-                report_text = "\n\n".join(report_parts)
-                # Enforce word limits
-                report_text, status = enforce_word_limits(report_text, min_words=450, max_words=490)
-                final_count = word_count(report_text)
-
-                # Display report
-                st.subheader(f"{industry} Industry Report")
-                st.write(report_text)
-                st.divider()
-                st.info(f"📊 Final Word Count: {final_count} words")
-
-                if status == "too_short":
-                    st.warning(f"⚠️ Report is under 450 words ({final_count} words). Try regenerating.")
-                elif status == "truncated":
-                    st.info(f"✂️ Report was trimmed to {final_count} words.")
-                else:
-                    st.success("✅ Report meets the 450–500 word target.")
-
-            except Exception as e:
-                st.error(f"Error generating report: {e}")
-
-
-
-
-
+                return
+
+            if not relevant_urls:
+                st.warning("No relevant Wikipedia pages found. Try a broader industry name.")
+                return
+
+            show_sources(relevant_urls)
+
+            # Step 3: Generate report
+            # The report header and its placeholder are laid out before any Gemini work starts, so the
+            # page shows sources and the report frame straight away and tokens stream in below them.
+            st.subheader(f"{industry} Industry Report")
+            report_placeholder = st.empty()
+
+            with st.spinner("Drafting your industry report..."):
+
+                full_context = build_context(all_texts)
+
+        #During the course of preparing this chat, I found that making system meet the word count by seperating instructions for text into sub sections work best. 
+
+                sections = [
+                    "EXECUTIVE SUMMARY",
+                    "MARKET DYNAMICS & SIZE",
+                    "KEY TECHNOLOGICAL OR SOCIAL TRENDS",
+                    "COMPETITIVE LANDSCAPE",
+                    "FUTURE OUTLOOK & CHALLENGES"
+                ]
+
+                context_block = f"WIKIPEDIA CONTEXT:\n{full_context}\n"
+                # Sections answered before are taken from the response cache ("Regenerate" skips it);
+                # only the rest go to Gemini, and the context cache is only worth creating for those.
+                section_keys = {
+                    section: section_cache_key(section, industry, context_block) for section in sections
+                }
+                cached_sections = {}
+                if not regenerate_clicked:
+                    for section in sections:
+                        cached_text = llm_cache_get(section_keys[section])
+                        if cached_text:
+                            cached_sections[section] = cached_text
+                pending_sections = [section for section in sections if section not in cached_sections]
+
+                context_cache = create_context_cache(client, context_block) if pending_sections else None
+                cache_name = context_cache.name if context_cache else None
+
+                try:
+                    # Sections don't depend on each other, so all five are requested at once. Workers
+                    # can't touch Streamlit elements, so they pass streamed text back through a queue
+                    # and this thread writes it into each section's placeholder.
+                    updates = queue.Queue()
+                    with report_placeholder.container():
+                        section_placeholders = {section: st.empty() for section in sections}
+                    for section, cached_text in cached_sections.items():
+                        section_placeholders[section].markdown(cached_text)
+                    streamed = dict.fromkeys(sections, "")
+
+                    with ThreadPoolExecutor(max_workers=max(len(pending_sections), 1)) as executor:
+                        futures = {
+                            section: executor.submit(
+                                generate_section, client, section, industry, context_block, cache_name, updates
+                            )
+                            for section in pending_sections
+                        }
+                        while not all(future.done() for future in futures.values()) or not updates.empty():
+                            try:
+                                section, text = updates.get(timeout=0.1)
+                            except queue.Empty:
+                                continue
+                            if text is None:
+                                streamed[section] = ""
+                                section_placeholders[section].empty()
+                                continue
+                            streamed[section] += text
+                            section_placeholders[section].markdown(streamed[section])
+
+                    # A failed section is reported but doesn't throw away the ones that succeeded
+                    report_parts, failures = [], []
+                    for section in sections:
+                        if section in cached_sections:
+                            report_parts.append(cached_sections[section])
+                            continue
+                        try:
+                            section_text = futures[section].result()
+                        except Exception as e:
+                            failures.append(f"⚠️ Error generating section {section}: {e}")
+                            continue
+                        if not section_text:
+                            failures.append(f"⚠️ Model returned empty response for section: {section}")
+                            continue
+                        llm_cache_put(section_keys[section], section_text)
+                        report_parts.append(section_text)
+
+                    if not report_parts:
+                        report_placeholder.empty()
+                        for message in failures:
+                            st.error(message)
+                        return
+
+                    # Combine the generated sections
+                    report_text = "\n\n".join(report_parts)
+                    # Enforce word limits
+                    report_text, status, final_count = enforce_word_limits(report_text, min_words=450, max_words=490)
+
+                    # Replace the streamed sections with the final (possibly trimmed) report
+                    report_placeholder.write(report_text)
+                    for message in failures:
+                        st.error(message)
+                    show_word_count_status(final_count, status)
+
+                    st.session_state.last_report = {
+                        "industry": industry,
+                        "text": report_text,
+                        "urls": relevant_urls,
+                        "count": final_count,
+                        "status": status,
+                    }
+
+                except Exception as e:
+                    st.error(f"Error generating report: {e}")
+                finally:
+                    if context_cache:
+                        try:
+                            client.caches.delete(name=context_cache.name)
+                        except Exception:
+                            pass
+    elif last_report.get("industry") == industry:
+        # Any other rerun (another widget, the sidebar) keeps the last report on screen instead of
+        # clearing it, so nobody has to click Generate again just to see it.
+        show_saved_report(last_report)
+
+report_section(client)